@@ -1,35 +1,102 @@
 import asyncio
-import json
+import itertools
+import multiprocessing
+import struct
 import time
 import os
+import zlib
+from collections import OrderedDict
 from typing import Dict, Any
-from contextlib import asynccontextmanager
+from contextlib import aclosing, asynccontextmanager
 
 import grpc
+import orjson
 from fastapi import FastAPI, WebSocketDisconnect, WebSocket, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 import server.market_data_pb2 as pb
 import server.market_data_pb2_grpc as pb_grpc
+from server.grpc_options import GRPC_CHANNEL_OPTIONS
 from server.metrics import metrics
 
 GRPC_HOST = os.getenv("GRPC_HOST", "localhost")
 GRPC_PORT = int(os.getenv("GRPC_PORT", "14000"))
+GRPC_POOL_SIZE = int(os.getenv("GRPC_POOL_SIZE", "4"))
+
+def _worker_count():
+    """Number of gateway workers, or None when this process cannot tell.
+
+    uvicorn takes its default --workers from WEB_CONCURRENCY but never sets it,
+    so a count given with --workers is invisible here. With one worker uvicorn
+    serves from its own process; multiple workers (and --reload) are spawned.
+    """
+    if "WEB_CONCURRENCY" in os.environ:
+        return int(os.environ["WEB_CONCURRENCY"])
+    if multiprocessing.parent_process() is None:
+        return 1
+    return None
+
+GATEWAY_WORKERS = _worker_count()
+
+# Binary frames are an 8-byte little-endian gateway timestamp (ms) followed by
+# a zlib-compressed OrderbookUpdateBatch of updates as received from the gRPC
+# server. Run uvicorn with --ws-per-message-deflate false so frames are not
+# compressed a second time per connection.
+FRAME_HEADER = struct.Struct("<Q")
+SUBSCRIBE_METHOD = "/market_data.MarketDataService/SubscribeOrderbook"
+
+# Updates already queued when a frame is sent are merged into it, up to this many
+BATCH_MAX_UPDATES = 32
+
+# Every client of an instrument usually sends the same batch body, so bodies
+# are compressed once and the result is shared through this cache.
+COMPRESSION_LEVEL = 1
+COMPRESSED_CACHE_SIZE = 256
+_compressed_bodies: "OrderedDict[bytes, bytes]" = OrderedDict()
+
+# Binary frames are forwarded without decoding; backend latency is sampled
+# from the newest update of one batch in every LATENCY_SAMPLE_EVERY.
+LATENCY_SAMPLE_EVERY = 16
 
 @asynccontextmanager
 async def lifespan(app):
-    channel = grpc.aio.insecure_channel(f"{GRPC_HOST}:{GRPC_PORT}")
-    stub = pb_grpc.MarketDataServiceStub(channel)
+    # Each channel keeps its own subchannel pool, so every channel is a separate
+    # HTTP/2 connection instead of all streams sharing one connection's limits.
+    channels = [
+        grpc.aio.insecure_channel(
+            f"{GRPC_HOST}:{GRPC_PORT}",
+            options=[("grpc.use_local_subchannel_pool", 1)] + GRPC_CHANNEL_OPTIONS,
+        )
+        for _ in range(GRPC_POOL_SIZE)
+    ]
+    stub = pb_grpc.MarketDataServiceStub(channels[0])
+    # Same RPC as stub.SubscribeOrderbook, but yields the raw serialized bytes
+    # so they can be forwarded without a decode/re-encode round trip.
+    subscribe_raw = [
+        channel.unary_stream(
+            SUBSCRIBE_METHOD,
+            request_serializer=pb.SubscriptionRequest.SerializeToString,
+            response_deserializer=None,
+        )
+        for channel in channels
+    ]
 
-    app.state.channel = channel
+    app.state.channels = channels
     app.state.stub = stub
+    app.state.subscribe_raw = subscribe_raw
+    app.state.rr = itertools.count()
 
     try:
         yield
     finally:
-        if channel:
+        for channel in channels:
             await channel.close()
 
+def pick_subscribe(app):
+    """Round-robin SubscribeOrderbook calls across the channel pool"""
+    pool = app.state.subscribe_raw
+    return pool[next(app.state.rr) % len(pool)]
+
 app = FastAPI(title="QuantFlow Gateway", lifespan=lifespan)
 metrics.enable_memory_tracking()
 app.add_middleware(
@@ -56,9 +123,110 @@ async def health():
 # Metrics endpoint — exposes throughput, latency percentiles, queue drops, connections, memory
 @app.get("/metrics")
 async def get_metrics():
-    return metrics.full_report()
+    report = metrics.full_report()
+    # Each worker has its own collector; identify the one that answered
+    report["worker"] = {"pid": os.getpid(), "workers": GATEWAY_WORKERS}
+    return report
+
+def _encode_batch(frames) -> bytes:
+    """Wrap serialized OrderbookUpdates in an OrderbookUpdateBatch without re-encoding them"""
+    out = bytearray()
+    for frame in frames:
+        out.append(0x0A)  # field 1 (updates), length-delimited
+        n = len(frame)
+        while n > 0x7F:
+            out.append((n & 0x7F) | 0x80)
+            n >>= 7
+        out.append(n)
+        out += frame
+    return bytes(out)
+
+def _compress_body(body: bytes) -> bytes:
+    """zlib-compress a frame body, reusing the result for identical bodies"""
+    compressed = _compressed_bodies.get(body)
+    if compressed is None:
+        compressed = zlib.compress(body, COMPRESSION_LEVEL)
+        _compressed_bodies[body] = compressed
+        if len(_compressed_bodies) > COMPRESSED_CACHE_SIZE:
+            _compressed_bodies.popitem(last=False)
+    return compressed
 
-# Stream updates as JSON
+async def _batched(stream_call, max_updates: int):
+    """Yield lists of raw updates: each waits for one update, then takes whatever else is queued"""
+    # A separate reader task is needed: cancelling a pending read on the call
+    # cancels the whole RPC. The queue is bounded so a slow client stops the
+    # reader, and gRPC flow control pushes back to the server, which evicts
+    # the stream if it falls too far behind.
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_updates)
+
+    async def pump():
+        try:
+            async for raw in stream_call:
+                await queue.put(raw)
+        except asyncio.CancelledError:
+            raise  # the consumer is gone; no end marker needed
+        except Exception:
+            await queue.put(None)
+            raise
+        await queue.put(None)
+
+    reader = asyncio.create_task(pump())
+    try:
+        done = False
+        while not done:
+            raw = await queue.get()
+            if raw is None:
+                break
+            # Never wait for more: a lone update is sent at once, a burst shares a frame
+            batch = [raw]
+            while len(batch) < max_updates:
+                try:
+                    raw = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if raw is None:
+                    done = True
+                    break
+                batch.append(raw)
+            yield batch
+        await reader  # surfaces any RpcError from the stream
+    finally:
+        reader.cancel()
+
+def _record_backend_latency(update, gateway_ts: int):
+    """Record gRPC->gateway latency (server timestamp -> gateway send)"""
+    if update.HasField("snapshot"):
+        server_ts = update.snapshot.timestamp
+    else:
+        server_ts = update.incremental.timestamp
+    if server_ts > 0:
+        metrics.e2e_backend_latency.record(gateway_ts - server_ts)
+
+def _update_to_json(update, gateway_ts: int) -> Dict[str, Any]:
+    """Debug representation of an update, used with ?format=json"""
+    payload: Dict[str, Any] = {"gateway_ts": gateway_ts}
+    if update.HasField("snapshot"):
+        s = update.snapshot
+        payload.update({
+            "type": "snapshot",
+            "instrument_id": s.instrument_id,
+            "timestamp": s.timestamp,
+            "bids": [[b.price, b.quantity] for b in s.bids],
+            "asks": [[a.price, a.quantity] for a in s.asks],
+        })
+    else:
+        inc = update.incremental
+        payload.update({
+            "type": "incremental",
+            "instrument_id": inc.instrument_id,
+            "timestamp": inc.timestamp,
+            "is_bid": inc.is_bid,
+            "update_type": inc.update_type,
+            "level": [inc.level.price, inc.level.quantity],
+        })
+    return payload
+
+# Stream updates as binary protobuf frames (or JSON with ?format=json)
 @app.websocket("/ws")
 async def ws_endpoint(ws: WebSocket):
     await ws.accept()
@@ -67,58 +235,46 @@ async def ws_endpoint(ws: WebSocket):
     try:
         qs = dict(ws.query_params)
         if "instrumentId" not in qs:
-            await ws.send_text(json.dumps({"error": "instrumentId required"}))
+            await ws.send_text(orjson.dumps({"error": "instrumentId required"}).decode())
             await ws.close()
             return
 
         try:
             instrument_id = int(qs["instrumentId"])
         except (ValueError, TypeError):
-            await ws.send_text(json.dumps({"error": "instrumentId must be an integer"}))
+            await ws.send_text(orjson.dumps({"error": "instrumentId must be an integer"}).decode())
             await ws.close()
             return
-        stub = ws.app.state.stub
+        as_json = qs.get("format") == "json"
+        subscribe_raw = pick_subscribe(ws.app)
         req = pb.SubscriptionRequest(instrument_id=instrument_id)
 
         tracked_instrument_id = instrument_id
         metrics.record_connection(instrument_id)
 
         # Subscribe to gRPC stream
-        stream_call = stub.SubscribeOrderbook(req)
+        stream_call = subscribe_raw(req)
 
-        # Forward updates to WebSocket client
+        # Forward updates to WebSocket client, coalescing bursts into one frame
         msg_count = 0
-        async for update in stream_call:
-            msg_count += 1
-            metrics.record_message(instrument_id)
-            gateway_ts = int(time.time() * 1000)
-            payload: Dict[str, Any] = {"gateway_ts": gateway_ts}
-
-            if update.HasField("snapshot"):
-                s = update.snapshot
-                # Record gRPC->gateway latency (server timestamp -> gateway receipt)
-                if s.timestamp > 0:
-                    metrics.e2e_backend_latency.record(gateway_ts - s.timestamp)
-                payload.update({
-                    "type": "snapshot",
-                    "instrument_id": s.instrument_id,
-                    "timestamp": s.timestamp,
-                    "bids": [[b.price, b.quantity] for b in s.bids],
-                    "asks": [[a.price, a.quantity] for a in s.asks],
-                })
-            else:
-                inc = update.incremental
-                if inc.timestamp > 0:
-                    metrics.e2e_backend_latency.record(gateway_ts - inc.timestamp)
-                payload.update({
-                    "type": "incremental",
-                    "instrument_id": inc.instrument_id,
-                    "timestamp": inc.timestamp,
-                    "is_bid": inc.is_bid,
-                    "update_type": inc.update_type,
-                    "level": [inc.level.price, inc.level.quantity],
-                })
-            await ws.send_text(json.dumps(payload))
+        batch_count = 0
+        async with aclosing(_batched(stream_call, BATCH_MAX_UPDATES)) as batches:
+            async for batch in batches:
+                gateway_ts = time.time_ns() // 1_000_000
+                for _ in batch:
+                    metrics.record_message(instrument_id)
+                msg_count += len(batch)
+
+                if as_json:
+                    for raw in batch:
+                        update = pb.OrderbookUpdate.FromString(raw)
+                        _record_backend_latency(update, gateway_ts)
+                        await ws.send_text(orjson.dumps(_update_to_json(update, gateway_ts)).decode())
+                else:
+                    if batch_count % LATENCY_SAMPLE_EVERY == 0:
+                        _record_backend_latency(pb.OrderbookUpdate.FromString(batch[-1]), gateway_ts)
+                    await ws.send_bytes(FRAME_HEADER.pack(gateway_ts) + _compress_body(_encode_batch(batch)))
+                batch_count += 1
 
     except WebSocketDisconnect:
         # client closed the socket
@@ -128,7 +284,7 @@ async def ws_endpoint(ws: WebSocket):
         pass
     except grpc.RpcError as e:
         try:
-            await ws.send_text(json.dumps({"error": str(e)}))
+            await ws.send_text(orjson.dumps({"error": str(e)}).decode())
         except Exception:
             pass
     finally:
@@ -1,106 +1,214 @@
 import asyncio
 import aiohttp
+import itertools
 import json
+import msgspec
 import websockets
 import time
+from operator import itemgetter
+from typing import List, Optional, Tuple
 
 from .metrics import metrics
 
+# Levels kept per side; instrument depths are sliced from these
+MAX_DEPTH = 50
+
+class DepthMessage(msgspec.Struct):
+    """Binance @depth20 partial book message.
+
+    Prices and quantities arrive as JSON strings; decoding with strict=False
+    converts them to floats while parsing.
+    """
+    bids: Optional[List[Tuple[float, float]]] = None
+    asks: Optional[List[Tuple[float, float]]] = None
+    lastUpdateId: int = 0
+
+_depth_decoder = msgspec.json.Decoder(DepthMessage, strict=False)
+
+class StreamMessage(msgspec.Struct):
+    """Combined-stream envelope; data is left undecoded until the symbol is known to be wanted."""
+    stream: str = ""
+    data: msgspec.Raw = msgspec.Raw(b"null")
+
+_envelope_decoder = msgspec.json.Decoder(StreamMessage)
+
+def _top_levels(levels, depth, descending):
+    """Return the best `depth` non-empty levels from (price, qty) pairs"""
+    return sorted(
+        (level for level in levels if level[1] > 0),
+        key=itemgetter(0),
+        reverse=descending,
+    )[:depth]
+
 class BinanceOrderbookManager:
-    """Manages real-time orderbook data from Binance WebSocket streams."""
+    """Manages real-time orderbook data from Binance WebSocket streams.
 
-    def __init__(self):
+    All symbols share one combined-stream connection; symbols are added and
+    removed on the live socket with SUBSCRIBE/UNSUBSCRIBE control messages.
+    """
+
+    def __init__(self, max_depth=MAX_DEPTH):
+        self.max_depth = max_depth
         self.orderbooks = {}  # symbol -> orderbook data
-        self.subscribers = {}  # symbol -> list of callback functions
-        self.websocket_tasks = {}  # symbol -> websocket task
-        self.base_url = "wss://stream.binance.com:9443/ws/"
+        self.subscribers = {}  # symbol -> set of callback functions
+        self._last_update_ids = {}  # symbol -> lastUpdateId of the last processed message
+        self.base_url = "wss://stream.binance.com:9443/stream"
+        self._stream_task = None  # task running the combined-stream connection
+        self._websocket = None  # live combined-stream connection, if connected
+        self._control_ids = itertools.count(1)
+        self._session = None  # shared aiohttp.ClientSession for REST calls
+        self._symbols_cache = None  # (fetched_at monotonic seconds, symbols)
+        self._symbols_ttl = 300.0
 
     async def subscribe_to_symbol(self, symbol, callback):
         """Subscribe to orderbook updates for a symbol"""
         symbol = symbol.lower()
 
-        if symbol not in self.subscribers:
-            self.subscribers[symbol] = []
+        new_symbol = symbol not in self.subscribers
+        if new_symbol:
+            self.subscribers[symbol] = set()
 
-        self.subscribers[symbol].append(callback)
+        self.subscribers[symbol].add(callback)
 
-        if symbol not in self.websocket_tasks:
-            self.websocket_tasks[symbol] = asyncio.create_task(
-                self._start_websocket_stream(symbol)
-            )
+        if self._stream_task is None:
+            self._stream_task = asyncio.create_task(self._start_websocket_stream())
+        elif new_symbol:
+            await self._send_control("SUBSCRIBE", [symbol])
 
     async def unsubscribe_from_symbol(self, symbol, callback):
         """Unsubscribe from orderbook updates"""
         symbol = symbol.lower()
 
         if symbol in self.subscribers and callback in self.subscribers[symbol]:
-            self.subscribers[symbol].remove(callback)
+            self.subscribers[symbol].discard(callback)
 
-            # Stop WebSocket if no more subscribers
-            if not self.subscribers[symbol] and symbol in self.websocket_tasks:
-                self.websocket_tasks[symbol].cancel()
-                del self.websocket_tasks[symbol]
+            if not self.subscribers[symbol]:
                 del self.subscribers[symbol]
+                self._last_update_ids.pop(symbol, None)
+
+                # Close the connection once no symbols are left, otherwise drop just this stream
+                if not self.subscribers and self._stream_task is not None:
+                    self._stream_task.cancel()
+                    self._stream_task = None
+                    self._websocket = None
+                else:
+                    await self._send_control("UNSUBSCRIBE", [symbol])
+
+    @staticmethod
+    def _stream_name(symbol):
+        return f"{symbol}@depth20@100ms"
+
+    async def _send_control(self, method, symbols):
+        """Send a SUBSCRIBE/UNSUBSCRIBE request on the live connection.
 
-    async def _start_websocket_stream(self, symbol):
-        """Start WebSocket stream for a symbol."""
-        stream_name = f"{symbol}@depth20@100ms"
-        url = f"{self.base_url}{stream_name}"
+        Without a connection this is a no-op: the stream list is rebuilt from
+        self.subscribers when the connection is (re)established.
+        """
+        websocket = self._websocket
+        if websocket is None or not symbols:
+            return
+        request = {
+            "method": method,
+            "params": [self._stream_name(s) for s in symbols],
+            "id": next(self._control_ids),
+        }
+        try:
+            await websocket.send(json.dumps(request))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    async def _start_websocket_stream(self):
+        """Run the combined stream for all subscribed symbols, reconnecting on failure."""
         reconnect_start = None
 
         while True:
             try:
-                print(f"Connecting to Binance WebSocket for {symbol.upper()}...")
-                connect_start = time.time() * 1000
+                symbols = set(self.subscribers)
+                streams = "/".join(self._stream_name(s) for s in sorted(symbols))
+                url = f"{self.base_url}?streams={streams}"
+                print(f"Connecting to Binance combined stream for {len(symbols)} symbols...")
                 async with websockets.connect(url) as websocket:
                     connected_at = time.time() * 1000
-                    print(f"Connected to {symbol.upper()} stream")
+                    self._websocket = websocket
+                    print("Connected to Binance combined stream")
+
+                    # Catch up on symbols added or removed while connecting
+                    current = set(self.subscribers)
+                    await self._send_control("SUBSCRIBE", sorted(current - symbols))
+                    await self._send_control("UNSUBSCRIBE", sorted(symbols - current))
 
                     # Record reconnection recovery time if this was a reconnect
                     if reconnect_start is not None:
                         recovery_ms = connected_at - reconnect_start
-                        metrics.record_reconnection(symbol, recovery_ms)
-                        print(f"Reconnected {symbol.upper()} in {recovery_ms:.0f}ms")
+                        for symbol in current:
+                            metrics.record_reconnection(symbol, recovery_ms)
+                        print(f"Reconnected in {recovery_ms:.0f}ms")
                         reconnect_start = None
 
-                    async for message in websocket:
-                        data = json.loads(message)
-                        await self._process_orderbook_update(symbol, data)
+                    try:
+                        async for message in websocket:
+                            await self._process_orderbook_update(message)
+                    finally:
+                        if self._websocket is websocket:
+                            self._websocket = None
 
             except websockets.exceptions.ConnectionClosed:
-                print(f"WebSocket connection closed for {symbol}, reconnecting...")
+                print("Binance combined stream closed, reconnecting...")
                 reconnect_start = time.time() * 1000
                 await asyncio.sleep(5)
             except Exception as e:
-                print(f"Error in WebSocket stream for {symbol}: {e}")
+                print(f"Error in Binance combined stream: {e}")
                 if reconnect_start is None:
                     reconnect_start = time.time() * 1000
                 await asyncio.sleep(5)
 
-    async def _process_orderbook_update(self, symbol, data):
-        """Process incoming orderbook data from Binance.
+    async def _process_orderbook_update(self, message):
+        """Process a raw combined-stream message from Binance.
 
-        The @depth20 stream sends full top-20 snapshots (fields: bids, asks),
-        unlike the @depth diff stream (fields: b, a) which sends incremental diffs.
+        Messages are wrapped as {"stream": "<symbol>@depth20@100ms", "data": ...};
+        the stream name routes the payload to its symbol. The @depth20 stream
+        sends full top-20 snapshots (fields: bids, asks), unlike the @depth diff
+        stream (fields: b, a) which sends incremental diffs. Replies to control
+        messages carry no stream and are ignored.
         """
         binance_receipt_ts = time.time() * 1000  # timestamp at moment of receipt
 
-        if 'bids' not in data or 'asks' not in data:
+        try:
+            envelope = _envelope_decoder.decode(message)
+        except msgspec.DecodeError as e:
+            print(f"Ignoring malformed message: {e}")
             return
+        symbol = envelope.stream.partition("@")[0]
 
-        bids = [(float(price), float(qty)) for price, qty in data['bids']]
-        asks = [(float(price), float(qty)) for price, qty in data['asks']]
+        # Nobody to notify (e.g. a message racing an unsubscribe): skip parsing
+        if not self.subscribers.get(symbol):
+            return
 
-        # Sort bids (highest first) and asks (lowest first)
-        bids.sort(reverse=True)
-        asks.sort()
+        try:
+            data = _depth_decoder.decode(envelope.data)
+        except msgspec.DecodeError as e:
+            print(f"Ignoring malformed message for {symbol}: {e}")
+            return
+
+        if data.bids is None or data.asks is None:
+            return
+
+        # An unchanged lastUpdateId means an unchanged book
+        last_update_id = data.lastUpdateId
+        if last_update_id and last_update_id == self._last_update_ids.get(symbol):
+            return
+        self._last_update_ids[symbol] = last_update_id
+
+        # Top levels only: bids highest first, asks lowest first
+        bids = _top_levels(data.bids, self.max_depth, descending=True)
+        asks = _top_levels(data.asks, self.max_depth, descending=False)
 
         orderbook_data = {
             'symbol': symbol.upper(),
             'bids': bids,
             'asks': asks,
-            'timestamp': int(time.time() * 1000),
-            'last_update_id': data.get('lastUpdateId', 0),
+            'timestamp': time.time_ns() // 1_000_000,
+            'last_update_id': last_update_id,
             'binance_receipt_ts': binance_receipt_ts,
         }
 
@@ -108,7 +216,7 @@ class BinanceOrderbookManager:
 
         # Notify all subscribers
         if symbol in self.subscribers:
-            for callback in self.subscribers[symbol]:
+            for callback in list(self.subscribers[symbol]):
                 try:
                     await callback(orderbook_data)
                 except Exception as e:
@@ -118,20 +226,46 @@ class BinanceOrderbookManager:
         """Get current orderbook snapshot"""
         return self.orderbooks.get(symbol.lower())
 
+    async def _get_session(self):
+        """Return the shared HTTP session, creating it on first use"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=20, ttl_dns_cache=300, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        """Close the shared HTTP session"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _fetch_symbols(self):
+        """Fetch all trading symbols from Binance's exchangeInfo endpoint"""
+        session = await self._get_session()
+        async with session.get('https://api.binance.com/api/v3/exchangeInfo') as response:
+            data = await response.json()
+            symbols = []
+            for symbol_info in data['symbols']:
+                if symbol_info['status'] == 'TRADING':
+                    symbols.append(symbol_info['symbol'])
+            return symbols
+
+    def invalidate_symbols(self):
+        """Drop the cached symbol list so the next call refetches it"""
+        self._symbols_cache = None
+
     async def get_available_symbols(self):
-        """Get list of available trading symbols from Binance"""
+        """Get list of available trading symbols from Binance, cached for _symbols_ttl seconds"""
+        now = time.monotonic()
+        if self._symbols_cache is not None and now - self._symbols_cache[0] < self._symbols_ttl:
+            return self._symbols_cache[1][:50]
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get('https://api.binance.com/api/v3/exchangeInfo') as response:
-                    data = await response.json()
-                    symbols = []
-                    for symbol_info in data['symbols']:
-                        if symbol_info['status'] == 'TRADING':
-                            symbols.append(symbol_info['symbol'])
-                    return symbols[:50]
+            symbols = await self._fetch_symbols()
         except Exception as e:
             print(f"Error fetching symbols: {e}")
             return ['BTCUSDT', 'ETHUSDT', 'ADAUSDT']
+        self._symbols_cache = (now, symbols)
+        return symbols[:50]
 
 class RealDataOrderbook:
     """Wrapper to integrate Binance data with internal orderbook structure."""
@@ -140,7 +274,7 @@ class RealDataOrderbook:
         self.instrument = instrument
         self.binance_manager = binance_manager
         self.current_data = None
-        self._subscribers = []
+        self._subscribers = set()
         self._feed_started = False
         self.binance_symbol = self._map_to_binance_symbol(instrument.symbol)
 
@@ -177,7 +311,7 @@ class RealDataOrderbook:
         """Handle updates from Binance"""
         self.current_data = orderbook_data
 
-        for callback in self._subscribers:
+        for callback in list(self._subscribers):
             try:
                 await callback(orderbook_data)
             except Exception as e:
@@ -185,12 +319,11 @@ class RealDataOrderbook:
 
     def add_subscriber(self, callback):
         """Add a callback for orderbook updates"""
-        self._subscribers.append(callback)
+        self._subscribers.add(callback)
 
     def remove_subscriber(self, callback):
         """Remove a callback"""
-        if callback in self._subscribers:
-            self._subscribers.remove(callback)
+        self._subscribers.discard(callback)
 
     def get_current_snapshot(self):
         """Get current orderbook snapshot in your format"""
@@ -1,10 +1,12 @@
 import asyncio
+import aioconsole
 import grpc
 import signal
 import time
 
 import server.market_data_pb2_grpc as market_data_pb2_grpc
 import server.market_data_pb2 as market_data_pb2
+from server.grpc_options import GRPC_CHANNEL_OPTIONS
 
 
 class MarketDataClient:
@@ -27,7 +29,7 @@ class MarketDataClient:
         self._print_interval = 1.0  # seconds
 
     async def connect(self):
-        self.channel = grpc.aio.insecure_channel(self.server_address)
+        self.channel = grpc.aio.insecure_channel(self.server_address, options=GRPC_CHANNEL_OPTIONS)
         self.stub = market_data_pb2_grpc.MarketDataServiceStub(self.channel)
         print(f"Connected to market data server at {self.server_address}")
 
@@ -149,10 +151,10 @@ class MarketDataClient:
 
         print_list()
 
-        loop = asyncio.get_running_loop()
         while self._running:
             try:
-                line = await loop.run_in_executor(None, input, "> ")
+                # Reads stdin on the event loop; no executor thread per prompt
+                line = await aioconsole.ainput("> ")
             except (EOFError, KeyboardInterrupt):
                 self.stop()
                 break
@@ -250,6 +252,8 @@ async def main():
 
 
 if __name__ == "__main__":
+    import uvloop
+    uvloop.install()
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
@@ -0,0 +1,28 @@
+"""
+gRPC channel and server options shared by the server, the CLI client and the gateway.
+
+The two lists are kept together so their keepalive settings stay compatible:
+clients ping every 60s, and the server accepts pings as often as every 30s.
+"""
+
+# Keepalive pings stop idle proxies from killing long-lived streams
+GRPC_CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 60000),
+    ("grpc.keepalive_timeout_ms", 20000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+    ("grpc.max_receive_message_length", 16 << 20),
+]
+
+# Match the clients' keepalive settings (pings allowed every 30s even without
+# active calls) and raise the per-connection stream limit for the gateway pool.
+GRPC_SERVER_OPTIONS = [
+    ("grpc.keepalive_time_ms", 60000),
+    ("grpc.keepalive_timeout_ms", 20000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+    ("grpc.http2.min_recv_ping_interval_without_data_ms", 30000),
+    ("grpc.max_concurrent_streams", 1000),
+    ("grpc.max_send_message_length", 16 << 20),
+    ("grpc.max_receive_message_length", 16 << 20),
+]
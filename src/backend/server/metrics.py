@@ -120,11 +120,11 @@ class MetricsCollector:
 
     # --- Queue Drops ---
 
-    def record_queue_attempt(self, instrument_id: int, dropped: bool):
+    def record_queue_attempt(self, instrument_id: int, dropped: bool, count: int = 1):
         with self._lock:
-            self._queue_total[instrument_id] += 1
+            self._queue_total[instrument_id] += count
             if dropped:
-                self._queue_drops[instrument_id] += 1
+                self._queue_drops[instrument_id] += count
 
     def get_queue_stats(self) -> Dict:
         with self._lock:
@@ -8,10 +8,14 @@ from collections import defaultdict
 from . import market_data_pb2, market_data_pb2_grpc
 
 from .binance_integration import BinanceOrderbookManager, RealDataOrderbook
+from .grpc_options import GRPC_SERVER_OPTIONS
 from .metrics import metrics
 
 CONFIG_PATH = os.path.join(os.path.dirname(__file__), "..", "config.json")
 
+# Streams that fall this many ticks behind the latest frame are disconnected
+SLOW_CONSUMER_MAX_MISSED = 50
+
 class Instrument:
     def __init__(self, instrument_id, symbol, depth):
         self.id = instrument_id
@@ -37,7 +41,8 @@ class MarketDataServicer(market_data_pb2_grpc.MarketDataServiceServicer):
         self.config = config
         self.orderbooks = {}
         self._active_streams = defaultdict(set)
-        self._stream_queues = defaultdict(dict)  # instrument_id -> {stream_context -> queue}
+        self._latest = {}  # instrument_id -> (seq, serialized update)
+        self._tick_events = defaultdict(asyncio.Event)  # instrument_id -> fired on each new frame
         self._instrument_callbacks = {}  # instrument_id -> single callback
 
         self.use_real_data = config.use_real_data()
@@ -78,8 +83,6 @@ class MarketDataServicer(market_data_pb2_grpc.MarketDataServiceServicer):
             context.set_details(f'Instrument {instrument_id} not found')
             return
 
-        update_queue = asyncio.Queue(maxsize=100)
-        self._stream_queues[instrument_id][context] = update_queue
         self._active_streams[instrument_id].add(context)
         metrics.record_connection(instrument_id)
 
@@ -95,29 +98,54 @@ class MarketDataServicer(market_data_pb2_grpc.MarketDataServiceServicer):
         try:
             await orderbook.start_real_data_feed()
 
+            last_seq = self._latest.get(instrument_id, (0, None))[0]
             snapshot_data = orderbook.get_current_snapshot()
             if not snapshot_data:
                 await asyncio.sleep(2)
                 snapshot_data = orderbook.get_current_snapshot()
             if snapshot_data:
+                last_seq = self._latest.get(instrument_id, (0, None))[0]
                 update, _ = self._create_snapshot_update(snapshot_data)
-                yield update
-
-            while not context.cancelled():
-                try:
-                    item = await asyncio.wait_for(update_queue.get(), timeout=1.0)
-                    update, binance_ts = item
-                    yield update
-                except asyncio.TimeoutError:
+                yield update.SerializeToString()
+
+            tick_event = self._tick_events[instrument_id]
+            closed = False
+
+            # Wake the waiting loop as soon as the RPC ends instead of polling for it
+            def on_done(_):
+                nonlocal closed
+                closed = True
+                tick_event.set()
+                tick_event.clear()
+            context.add_done_callback(on_done)
+
+            while not closed:
+                seq, frame = self._latest.get(instrument_id, (0, None))
+                if seq == last_seq:
+                    try:
+                        await tick_event.wait()
+                    except asyncio.CancelledError:
+                        break
                     continue
-                except asyncio.CancelledError:
-                    break
+
+                # Snapshots are idempotent, so a lagging stream skips straight to
+                # the newest frame; one that lags too far is disconnected.
+                missed = seq - last_seq - 1
+                if missed > 0:
+                    metrics.record_queue_attempt(instrument_id, dropped=True, count=missed)
+                metrics.record_queue_attempt(instrument_id, dropped=False)
+                if missed > SLOW_CONSUMER_MAX_MISSED:
+                    context.set_code(grpc.StatusCode.RESOURCE_EXHAUSTED)
+                    context.set_details(f'Stream fell {missed} updates behind')
+                    return
+
+                last_seq = seq
+                yield frame
 
         except Exception as e:
             print(f"Error in subscription for instrument {instrument_id}: {e}")
         finally:
             self._active_streams[instrument_id].discard(context)
-            self._stream_queues[instrument_id].pop(context, None)
             metrics.record_disconnection(instrument_id)
 
             if not self._active_streams[instrument_id]:
@@ -143,8 +171,8 @@ class MarketDataServicer(market_data_pb2_grpc.MarketDataServiceServicer):
         return update, snapshot_data.get('binance_receipt_ts')
 
     async def _queue_update_for_streams(self, instrument_id, orderbook_data):
-        """Queue updates for all active streams of an instrument"""
-        if instrument_id not in self._stream_queues:
+        """Publish the latest update and wake all active streams of an instrument"""
+        if not self._active_streams.get(instrument_id):
             return
 
         # Measure server processing latency (binance receipt -> queue fanout)
@@ -160,33 +188,51 @@ class MarketDataServicer(market_data_pb2_grpc.MarketDataServiceServicer):
             'timestamp': orderbook_data['timestamp'],
             'binance_receipt_ts': binance_receipt_ts,
         }
+        update, _ = self._create_snapshot_update(snapshot_data)
+        # Serialize once here; every stream yields the same bytes as-is
+        frame = update.SerializeToString()
 
-        item = self._create_snapshot_update(snapshot_data)  # (update, binance_receipt_ts)
+        seq = self._latest.get(instrument_id, (0, None))[0] + 1
+        self._latest[instrument_id] = (seq, frame)
         metrics.record_message(instrument_id)
 
-        # Add to all stream queues for this instrument (drop oldest if full)
-        for stream_context, queue in list(self._stream_queues[instrument_id].items()):
-            dropped = False
-            try:
-                queue.put_nowait(item)
-            except asyncio.QueueFull:
-                dropped = True
-                try:
-                    queue.get_nowait()
-                except asyncio.QueueEmpty:
-                    pass
-                try:
-                    queue.put_nowait(item)
-                except asyncio.QueueFull:
-                    pass
-            metrics.record_queue_attempt(instrument_id, dropped)
+        # Wake every waiting stream at once; each reads the latest slot
+        tick_event = self._tick_events[instrument_id]
+        tick_event.set()
+        tick_event.clear()
+
+def _serialize_update(update):
+    """Pass pre-serialized updates through, serialize anything else"""
+    if isinstance(update, bytes):
+        return update
+    return update.SerializeToString()
+
+def add_servicer_to_server(servicer, server):
+    """Register the servicer like the generated add_MarketDataServiceServicer_to_server,
+    but let SubscribeOrderbook yield bytes that were serialized once at fan-out.
+    """
+    rpc_method_handlers = {
+        'SubscribeOrderbook': grpc.unary_stream_rpc_method_handler(
+            servicer.SubscribeOrderbook,
+            request_deserializer=market_data_pb2.SubscriptionRequest.FromString,
+            response_serializer=_serialize_update,
+        ),
+        'GetInstruments': grpc.unary_unary_rpc_method_handler(
+            servicer.GetInstruments,
+            request_deserializer=market_data_pb2.Empty.FromString,
+            response_serializer=market_data_pb2.InstrumentsResponse.SerializeToString,
+        ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+        'market_data.MarketDataService', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
 
 async def serve():
     config = ServerConfig(CONFIG_PATH)
-    server = grpc.aio.server()
+    server = grpc.aio.server(options=GRPC_SERVER_OPTIONS)
 
     servicer = MarketDataServicer(config)
-    market_data_pb2_grpc.add_MarketDataServiceServicer_to_server(servicer, server)
+    add_servicer_to_server(servicer, server)
 
     port = config.get_port()
     server.add_insecure_port(f'[::]:{port}')
@@ -200,6 +246,10 @@ async def serve():
     except KeyboardInterrupt:
         print("Shutting down server...")
         await server.stop(grace=5)
+    finally:
+        await servicer.binance_manager.close()
 
 if __name__ == '__main__':
+    import uvloop
+    uvloop.install()
     asyncio.run(serve())
\ No newline at end of file
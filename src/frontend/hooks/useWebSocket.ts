@@ -1,5 +1,6 @@
 "use client";
 import { useCallback, useEffect, useRef, useState } from "react";
+import { decodeFrame } from "@/lib/marketData";
 
 export type SnapMsg = {
   type: "snapshot";
@@ -44,6 +45,9 @@ export function useWebSocket(url?: string): { connected: boolean; subscribe: Sub
     function connect() {
       if (disposed) return;
       ws = new WebSocket(url!);
+      ws.binaryType = "arraybuffer";
+      // Binary frames inflate asynchronously; chain handling to keep messages in order
+      let pending: Promise<void> = Promise.resolve();
 
       ws.onopen = () => {
         setConnected(true);
@@ -58,14 +62,19 @@ export function useWebSocket(url?: string): { connected: boolean; subscribe: Sub
         }
       };
       ws.onmessage = (e) => {
-        let data: WsMsg;
-        try {
-          data = JSON.parse(e.data);
-        } catch (err) {
-          console.error("WS parse error", err);
-          return;
-        }
-        listenersRef.current.forEach((cb) => cb(data));
+        pending = pending.then(async () => {
+          let data: WsMsg[];
+          try {
+            // Updates arrive as binary batch frames; text frames carry JSON (errors, ?format=json)
+            data = typeof e.data === "string" ? [JSON.parse(e.data)] : await decodeFrame(e.data);
+          } catch (err) {
+            console.error("WS parse error", err);
+            return;
+          }
+          for (const msg of data) {
+            listenersRef.current.forEach((cb) => cb(msg));
+          }
+        });
       };
     }
 
@@ -0,0 +1,143 @@
+// Decoder for the gateway's binary /ws frames.
+//
+// Frame layout: 8-byte little-endian gateway timestamp (ms), followed by a
+// zlib-compressed market_data.OrderbookUpdateBatch (see server/market_data.proto).
+// Only the fields the dashboard consumes are decoded; unknown fields are skipped.
+import type { IncMsg, SnapMsg, WsMsg } from "@/hooks/useWebSocket";
+
+const HEADER_BYTES = 8;
+
+class Reader {
+  pos: number;
+  readonly end: number;
+
+  constructor(private view: DataView, start: number, end: number) {
+    this.pos = start;
+    this.end = end;
+  }
+
+  varint(): number {
+    // Values here (ids, enums, ms timestamps) stay below 2^53
+    let result = 0;
+    let scale = 1;
+    let byte: number;
+    do {
+      byte = this.view.getUint8(this.pos++);
+      result += (byte & 0x7f) * scale;
+      scale *= 128;
+    } while (byte & 0x80);
+    return result;
+  }
+
+  double(): number {
+    const v = this.view.getFloat64(this.pos, true);
+    this.pos += 8;
+    return v;
+  }
+
+  sub(): Reader {
+    const len = this.varint();
+    const r = new Reader(this.view, this.pos, this.pos + len);
+    this.pos += len;
+    return r;
+  }
+
+  skip(wireType: number) {
+    if (wireType === 0) this.varint();
+    else if (wireType === 1) this.pos += 8;
+    else if (wireType === 2) this.pos += this.varint();
+    else if (wireType === 5) this.pos += 4;
+    else throw new Error(`unsupported wire type ${wireType}`);
+  }
+}
+
+function readLevel(r: Reader): [number, number] {
+  let price = 0;
+  let qty = 0;
+  while (r.pos < r.end) {
+    const tag = r.varint();
+    const field = tag >>> 3;
+    if (field === 1 && (tag & 7) === 1) price = r.double();
+    else if (field === 2 && (tag & 7) === 1) qty = r.double();
+    else r.skip(tag & 7);
+  }
+  return [price, qty];
+}
+
+function readSnapshot(r: Reader): SnapMsg {
+  const msg: SnapMsg = { type: "snapshot", instrument_id: 0, timestamp: 0, bids: [], asks: [] };
+  while (r.pos < r.end) {
+    const tag = r.varint();
+    switch (tag >>> 3) {
+      case 1: msg.instrument_id = r.varint(); break;
+      case 2: msg.bids.push(readLevel(r.sub())); break;
+      case 3: msg.asks.push(readLevel(r.sub())); break;
+      case 4: msg.timestamp = r.varint(); break;
+      default: r.skip(tag & 7);
+    }
+  }
+  return msg;
+}
+
+function readIncremental(r: Reader): IncMsg {
+  const msg: IncMsg = {
+    type: "incremental",
+    instrument_id: 0,
+    timestamp: 0,
+    is_bid: false,
+    update_type: 0,
+    level: [0, 0],
+  };
+  while (r.pos < r.end) {
+    const tag = r.varint();
+    switch (tag >>> 3) {
+      case 1: msg.instrument_id = r.varint(); break;
+      case 2: msg.update_type = r.varint(); break;
+      case 3: msg.level = readLevel(r.sub()); break;
+      case 4: msg.is_bid = r.varint() !== 0; break;
+      case 5: msg.timestamp = r.varint(); break;
+      default: r.skip(tag & 7);
+    }
+  }
+  return msg;
+}
+
+function readUpdate(r: Reader): WsMsg | null {
+  let msg: WsMsg | null = null;
+  while (r.pos < r.end) {
+    const tag = r.varint();
+    switch (tag >>> 3) {
+      case 1: msg = readSnapshot(r.sub()); break;
+      case 2: msg = readIncremental(r.sub()); break;
+      default: r.skip(tag & 7);
+    }
+  }
+  return msg;
+}
+
+async function inflate(body: ArrayBuffer): Promise<ArrayBuffer> {
+  // "deflate" in the Compression Streams API is the zlib format the gateway sends.
+  // A plain ArrayBuffer is a valid BlobPart; Uint8Array<ArrayBufferLike> is not in TS 5.7+.
+  const stream = new Blob([body]).stream().pipeThrough(new DecompressionStream("deflate"));
+  return new Response(stream).arrayBuffer();
+}
+
+export async function decodeFrame(buf: ArrayBuffer): Promise<WsMsg[]> {
+  const gatewayTs = Number(new DataView(buf).getBigUint64(0, true));
+  const body = await inflate(buf.slice(HEADER_BYTES));
+  const r = new Reader(new DataView(body), 0, body.byteLength);
+  const msgs: WsMsg[] = [];
+  while (r.pos < r.end) {
+    const tag = r.varint();
+    if (tag >>> 3 !== 1) {
+      r.skip(tag & 7);
+      continue;
+    }
+    const msg = readUpdate(r.sub());
+    if (msg) {
+      msg.gateway_ts = gatewayTs;
+      msgs.push(msg);
+    }
+  }
+  return msgs;
+}
@@ -7,7 +7,7 @@ Opens N concurrent WebSocket clients, measures:
 - Throughput (messages/sec per client and aggregate)
 - Message drop estimation (gaps in timestamp sequence)
 - Connection success rate
-- Memory delta from /metrics endpoint
+- Memory delta from /metrics endpoint (single-worker gateway only)
 
 Usage:
     python -m tests.load_test --clients 50 --duration 30 --instrument-id 1
@@ -18,8 +18,10 @@ import argparse
 import asyncio
 import json
 import statistics
+import struct
 import sys
 import time
+import zlib
 from dataclasses import dataclass, field
 from typing import List, Optional
 
@@ -57,6 +59,24 @@ def percentile(data: List[float], p: float) -> Optional[float]:
     return sorted_d[idx]
 
 
+def count_batch_updates(buf: bytes, pos: int) -> int:
+    """Count the updates (field 1 entries) in a serialized OrderbookUpdateBatch."""
+    count = 0
+    while pos < len(buf):
+        pos += 1  # tag 0x0A: field 1, length-delimited
+        length, shift = 0, 0
+        while True:
+            byte = buf[pos]
+            pos += 1
+            length |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                break
+        pos += length
+        count += 1
+    return count
+
+
 async def run_client(
     client_id: int,
     ws_url: str,
@@ -81,13 +101,19 @@ async def run_client(
                     continue
 
                 now = time.time() * 1000
-                msg = json.loads(raw)
+                if isinstance(raw, bytes):
+                    # Binary frame: 8-byte gateway timestamp header + zlib(OrderbookUpdateBatch)
+                    msg = {"gateway_ts": struct.unpack_from("<Q", raw)[0]}
+                    n_updates = count_batch_updates(zlib.decompress(raw[8:]), 0)
+                else:
+                    msg = json.loads(raw)
+                    n_updates = 1
 
                 if "error" in msg:
                     stats.errors += 1
                     continue
 
-                stats.messages_received += 1
+                stats.messages_received += n_updates
                 if stats.first_message_at is None:
                     stats.first_message_at = now
                 stats.last_message_at = now
@@ -120,6 +146,22 @@ async def fetch_server_metrics(gateway_base: str) -> Optional[dict]:
         return None
 
 
+def single_worker_gateway(*snapshots: Optional[dict]) -> bool:
+    """Whether /metrics snapshots are known to come from a single-worker gateway.
+
+    Each worker keeps its own metrics, so with several workers a snapshot is
+    not a gateway-wide total. Matching pids are not enough: with several
+    workers both requests can reach the same one. Only an explicit count of
+    one worker is trusted.
+    """
+    workers = [s.get("worker", {}) for s in snapshots if s]
+    return (
+        bool(workers)
+        and all(w.get("workers") == 1 for w in workers)
+        and len({w.get("pid") for w in workers}) == 1
+    )
+
+
 async def run_load_test(
     num_clients: int,
     duration: float,
@@ -242,7 +284,12 @@ async def run_load_test(
     print()
 
     # Server-side metrics
-    if post_metrics:
+    if post_metrics and not single_worker_gateway(pre_metrics, post_metrics):
+        print(f"  Server-Side Metrics (/metrics endpoint)")
+        print(f"  └─ Skipped: gateway is not known to run a single worker, and each")
+        print(f"     worker has its own /metrics (start it with WEB_CONCURRENCY=1)")
+        print()
+    elif post_metrics:
         print(f"  Server-Side Metrics (/metrics endpoint)")
         q = post_metrics.get("queue", {})
         if q:
@@ -0,0 +1,252 @@
+import asyncio
+import itertools
+import time
+import zlib
+
+import grpc
+import pytest
+from fastapi.testclient import TestClient
+
+import gateway.main as gateway
+from gateway.main import FRAME_HEADER, _batched, _compress_body, _encode_batch, app, pick_subscribe
+from server import market_data_pb2
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+class FakeStreamCall:
+    """Async-iterable stand-in for a unary_stream call yielding raw frames."""
+
+    def __init__(self, frames=(), delays=None, error=None, block=False):
+        self.frames = list(frames)
+        self.delays = delays or {}  # index -> seconds to wait before yielding it
+        self.error = error
+        self.block = block
+        self.sent = 0
+        self.cancelled = False
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        try:
+            for i, frame in enumerate(self.frames):
+                if i in self.delays:
+                    await asyncio.sleep(self.delays[i])
+                self.sent += 1
+                yield frame
+            if self.error is not None:
+                raise self.error
+            if self.block:
+                await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class FakeSubscribe:
+    """Stand-in for a raw SubscribeOrderbook callable from the channel pool."""
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.instrument_ids = []
+
+    def __call__(self, request):
+        self.instrument_ids.append(request.instrument_id)
+        return FakeStreamCall(self.frames)
+
+
+def _snapshot_bytes(n_levels, instrument_id=1, timestamp=1700000000000):
+    update = market_data_pb2.OrderbookUpdate(
+        snapshot=market_data_pb2.OrderbookSnapshot(
+            instrument_id=instrument_id,
+            bids=[market_data_pb2.PriceLevel(price=100.0 - i, quantity=1.0) for i in range(n_levels)],
+            asks=[market_data_pb2.PriceLevel(price=101.0 + i, quantity=1.0) for i in range(n_levels)],
+            timestamp=timestamp,
+        )
+    )
+    return update.SerializeToString()
+
+
+async def _collect(stream_call, max_updates=32):
+    batches = []
+    async for batch in _batched(stream_call, max_updates):
+        batches.append(batch)
+    return batches
+
+
+# ---------------------------------------------------------------------------
+# _batched Tests
+# ---------------------------------------------------------------------------
+
+@pytest.mark.asyncio
+async def test_batched_flushes_at_max_updates():
+    """A burst larger than max_updates should be split into full batches."""
+    call = FakeStreamCall([b"a", b"b", b"c", b"d", b"e"])
+    batches = await _collect(call, max_updates=2)
+    assert batches == [[b"a", b"b"], [b"c", b"d"], [b"e"]]
+
+
+@pytest.mark.asyncio
+async def test_batched_sends_lone_update_without_waiting():
+    """An update with nothing queued behind it should be flushed at once."""
+    call = FakeStreamCall([b"a", b"b"], delays={1: 0.2})
+    batches = _batched(call, 32)
+    assert await asyncio.wait_for(batches.__anext__(), timeout=0.05) == [b"a"]
+    assert await batches.__anext__() == [b"b"]
+    await batches.aclose()
+
+
+@pytest.mark.asyncio
+async def test_batched_ends_with_stream():
+    """The generator should finish once the stream ends, and not at all for an empty one."""
+    assert await _collect(FakeStreamCall([b"a"])) == [[b"a"]]
+    assert await _collect(FakeStreamCall([])) == []
+
+
+@pytest.mark.asyncio
+async def test_batched_propagates_rpc_error():
+    """An RpcError from the stream should surface after the frames received before it."""
+    error = grpc.aio.AioRpcError(
+        grpc.StatusCode.UNAVAILABLE, grpc.aio.Metadata(), grpc.aio.Metadata(), details="gone"
+    )
+    batches = []
+    with pytest.raises(grpc.RpcError):
+        async for batch in _batched(FakeStreamCall([b"a"], error=error), 32):
+            batches.append(batch)
+    assert batches == [[b"a"]]
+
+
+@pytest.mark.asyncio
+async def test_batched_cancels_reader_on_close():
+    """Closing the generator should cancel the task reading the stream."""
+    call = FakeStreamCall([b"a"], block=True)
+    batches = _batched(call, 32)
+    assert await batches.__anext__() == [b"a"]
+    await batches.aclose()
+    await asyncio.sleep(0)
+    assert call.cancelled
+
+
+@pytest.mark.asyncio
+async def test_batched_bounds_unread_updates():
+    """A consumer that stops reading should stop the reader after max_updates queued frames."""
+    call = FakeStreamCall([b"x"] * 1000, block=True)
+    batches = _batched(call, 4)
+    assert len(await batches.__anext__()) == 4
+    await asyncio.sleep(0.05)
+    # max_updates queued plus the one frame the reader is waiting to put
+    assert call.sent <= 4 + 4 + 1
+    await batches.aclose()
+
+
+# ---------------------------------------------------------------------------
+# Frame Encoding Tests
+# ---------------------------------------------------------------------------
+
+def test_encode_batch_round_trips():
+    """Encoded batches should parse as OrderbookUpdateBatch, including multi-byte lengths."""
+    frames = [_snapshot_bytes(0), _snapshot_bytes(5, instrument_id=2), _snapshot_bytes(500, instrument_id=3)]
+    assert len(frames[1]) >= 128
+    assert len(frames[2]) >= 1 << 14  # three-byte varint length
+
+    batch = market_data_pb2.OrderbookUpdateBatch.FromString(_encode_batch(frames))
+    assert [u.SerializeToString() for u in batch.updates] == frames
+    assert [u.snapshot.instrument_id for u in batch.updates] == [1, 2, 3]
+    assert _encode_batch([]) == b""
+
+
+def test_compress_body_round_trips_and_reuses(monkeypatch):
+    """Compressed bodies should decompress to the input and be shared for equal bodies."""
+    monkeypatch.setattr(gateway, "COMPRESSED_CACHE_SIZE", 2)
+    monkeypatch.setattr(gateway, "_compressed_bodies", type(gateway._compressed_bodies)())
+
+    body = _snapshot_bytes(20)
+    compressed = _compress_body(body)
+    assert zlib.decompress(compressed) == body
+    assert _compress_body(bytes(bytearray(body))) is compressed
+
+    _compress_body(b"one")
+    _compress_body(b"two")
+    assert len(gateway._compressed_bodies) == 2
+    assert body not in gateway._compressed_bodies
+
+
+# ---------------------------------------------------------------------------
+# WebSocket Endpoint Tests
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def ws_client(monkeypatch):
+    """TestClient whose channel pool is a single fake subscribe call."""
+    frames = [_snapshot_bytes(3, timestamp=1), _snapshot_bytes(2, timestamp=2)]
+    subscribe = FakeSubscribe(frames)
+    monkeypatch.setattr(app.state, "subscribe_raw", [subscribe], raising=False)
+    monkeypatch.setattr(app.state, "rr", itertools.count(), raising=False)
+    return TestClient(app), subscribe, frames
+
+
+def _receive_until_close(ws, receive):
+    messages = []
+    while True:
+        message = ws.receive()
+        if message["type"] == "websocket.close":
+            return messages
+        messages.append(message[receive])
+
+
+def test_ws_streams_binary_frames(ws_client):
+    """Binary frames should carry a gateway timestamp and a zlib-compressed update batch."""
+    client, subscribe, frames = ws_client
+    before = time.time_ns() // 1_000_000
+    with client.websocket_connect("/ws?instrumentId=7") as ws:
+        messages = _receive_until_close(ws, "bytes")
+
+    assert subscribe.instrument_ids == [7]
+    updates = []
+    for message in messages:
+        (gateway_ts,) = FRAME_HEADER.unpack_from(message)
+        assert before <= gateway_ts <= time.time_ns() // 1_000_000
+        body = zlib.decompress(message[FRAME_HEADER.size:])
+        updates.extend(market_data_pb2.OrderbookUpdateBatch.FromString(body).updates)
+    assert [u.SerializeToString() for u in updates] == frames
+
+
+def test_ws_streams_json_frames(ws_client):
+    """?format=json should send one text frame per update."""
+    client, _, _ = ws_client
+    with client.websocket_connect("/ws?instrumentId=7&format=json") as ws:
+        first = ws.receive_json()
+        second = ws.receive_json()
+
+    assert first["type"] == "snapshot"
+    assert first["timestamp"] == 1
+    assert first["bids"] == [[100.0, 1.0], [99.0, 1.0], [98.0, 1.0]]
+    assert first["asks"][0] == [101.0, 1.0]
+    assert second["timestamp"] == 2
+    assert first["gateway_ts"] > 0
+
+
+@pytest.mark.parametrize("query, error", [
+    ("", "instrumentId required"),
+    ("?instrumentId=abc", "instrumentId must be an integer"),
+])
+def test_ws_rejects_bad_instrument_id(ws_client, query, error):
+    """A missing or non-integer instrumentId should get an error frame and no subscription."""
+    client, subscribe, _ = ws_client
+    with client.websocket_connect(f"/ws{query}") as ws:
+        assert ws.receive_json() == {"error": error}
+    assert subscribe.instrument_ids == []
+
+
+def test_pick_subscribe_round_robins(monkeypatch):
+    """Subscriptions should rotate through the channel pool."""
+    pool = [object(), object(), object()]
+    monkeypatch.setattr(app.state, "subscribe_raw", pool, raising=False)
+    monkeypatch.setattr(app.state, "rr", itertools.count(), raising=False)
+    assert [pick_subscribe(app) for _ in range(4)] == pool + pool[:1]
@@ -1,10 +1,17 @@
 import asyncio
+import json
 import time
 
+import grpc
 import pytest
 
-from backend.server.server import Instrument, MarketDataServicer
-from backend.server.binance_integration import RealDataOrderbook, BinanceOrderbookManager
+from backend.server import market_data_pb2
+from backend.server.server import (
+    Instrument, MarketDataServicer, SLOW_CONSUMER_MAX_MISSED, _serialize_update,
+)
+from backend.server.binance_integration import (
+    RealDataOrderbook, BinanceOrderbookManager,
+)
 from backend.server.metrics import MetricsCollector, LatencyTracker
 
 
@@ -25,6 +32,43 @@ class FakeBinanceManager:
             callbacks.remove(callback)
 
 
+async def _noop_callback(data):
+    pass
+
+
+class FakeConfig:
+    def use_real_data(self):
+        return True
+
+    def get_instruments(self):
+        return [{"Id": 1, "Symbol": "BTC", "Specifications": {"Depth": 5}}]
+
+
+class FakeContext:
+    def __init__(self):
+        self.code = None
+        self.details = None
+        self._done_callbacks = []
+
+    def add_done_callback(self, callback):
+        self._done_callbacks.append(callback)
+
+    def finish(self):
+        for callback in self._done_callbacks:
+            callback(self)
+
+    def set_code(self, code):
+        self.code = code
+
+    def set_details(self, details):
+        self.details = details
+
+
+class FakeRequest:
+    def __init__(self, instrument_id):
+        self.instrument_id = instrument_id
+
+
 def _make_raw(symbol="BTCUSDT", n_levels=5, bid_start=100.0, ask_start=100.5):
     """Generate synthetic orderbook data."""
     return {
@@ -37,6 +81,19 @@ def _make_raw(symbol="BTCUSDT", n_levels=5, bid_start=100.0, ask_start=100.5):
     }
 
 
+def _combined(symbol, data):
+    """Wrap a depth payload the way Binance's combined stream delivers it."""
+    return json.dumps({"stream": f"{symbol}@depth20@100ms", "data": data})
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(json.loads(message))
+
+
 # ---------------------------------------------------------------------------
 # RealDataOrderbook Tests
 # ---------------------------------------------------------------------------
@@ -239,26 +296,74 @@ async def test_unknown_symbol_defaults_to_btcusdt():
 async def test_binance_manager_process_valid_data():
     """Valid Binance data should be parsed and stored."""
     mgr = BinanceOrderbookManager()
+    mgr.subscribers["btcusdt"] = {_noop_callback}
     data = {
         "bids": [["100.5", "1.0"], ["100.0", "2.0"]],
         "asks": [["101.0", "1.5"], ["101.5", "2.5"]],
         "lastUpdateId": 999,
     }
-    await mgr._process_orderbook_update("btcusdt", data)
+    await mgr._process_orderbook_update(_combined("btcusdt", data))
     ob = mgr.orderbooks.get("btcusdt")
     assert ob is not None
     assert ob["bids"][0][0] == 100.5  # highest bid first
     assert ob["asks"][0][0] == 101.0  # lowest ask first
 
 
+@pytest.mark.asyncio
+async def test_binance_manager_keeps_top_levels():
+    """Only the best max_depth non-empty levels should be kept per side."""
+    mgr = BinanceOrderbookManager(max_depth=3)
+    mgr.subscribers["btcusdt"] = {_noop_callback}
+    data = {
+        "bids": [[str(100 - i), "1.0"] for i in range(10)] + [["105", "0.0"]],
+        "asks": [[str(101 + i), "1.0"] for i in reversed(range(10))],
+        "lastUpdateId": 1,
+    }
+    await mgr._process_orderbook_update(_combined("btcusdt", data))
+    ob = mgr.orderbooks["btcusdt"]
+    assert [p for p, _ in ob["bids"]] == [100.0, 99.0, 98.0]
+    assert [p for p, _ in ob["asks"]] == [101.0, 102.0, 103.0]
+
+
 @pytest.mark.asyncio
 async def test_binance_manager_ignores_malformed_data():
     """Data without bids/asks should be silently ignored."""
     mgr = BinanceOrderbookManager()
-    await mgr._process_orderbook_update("btcusdt", {"foo": "bar"})
+    mgr.subscribers["btcusdt"] = {_noop_callback}
+    await mgr._process_orderbook_update(_combined("btcusdt", {"foo": "bar"}))
+    await mgr._process_orderbook_update(_combined("btcusdt", {"bids": [["x", "1"]], "asks": []}))
+    await mgr._process_orderbook_update("not json")
+    assert "btcusdt" not in mgr.orderbooks
+
+
+@pytest.mark.asyncio
+async def test_binance_manager_skips_without_subscribers():
+    """Data for a symbol with no subscribers should not be parsed or stored."""
+    mgr = BinanceOrderbookManager()
+    data = {"bids": [["50000", "1"]], "asks": [["50001", "1"]], "lastUpdateId": 1}
+    await mgr._process_orderbook_update(_combined("btcusdt", data))
     assert "btcusdt" not in mgr.orderbooks
 
 
+@pytest.mark.asyncio
+async def test_binance_manager_skips_repeated_update_id():
+    """A repeated lastUpdateId should not notify subscribers again."""
+    mgr = BinanceOrderbookManager()
+    received = []
+
+    async def cb(data):
+        received.append(data)
+
+    mgr.subscribers["btcusdt"] = {cb}
+    data = {"bids": [["50000", "1"]], "asks": [["50001", "1"]], "lastUpdateId": 1}
+    await mgr._process_orderbook_update(_combined("btcusdt", data))
+    await mgr._process_orderbook_update(_combined("btcusdt", data))
+    assert len(received) == 1
+
+    await mgr._process_orderbook_update(_combined("btcusdt", dict(data, lastUpdateId=2)))
+    assert len(received) == 2
+
+
 @pytest.mark.asyncio
 async def test_binance_manager_notifies_subscribers():
     """Subscribers should be notified on new data."""
@@ -268,14 +373,220 @@ async def test_binance_manager_notifies_subscribers():
     async def cb(data):
         received.append(data)
 
-    mgr.subscribers["btcusdt"] = [cb]
+    mgr.subscribers["btcusdt"] = {cb}
 
     data = {"bids": [["50000", "1"]], "asks": [["50001", "1"]], "lastUpdateId": 1}
-    await mgr._process_orderbook_update("btcusdt", data)
+    await mgr._process_orderbook_update(_combined("btcusdt", data))
     assert len(received) == 1
     assert received[0]["symbol"] == "BTCUSDT"
 
 
+@pytest.mark.asyncio
+async def test_binance_manager_routes_by_stream():
+    """Combined-stream messages should reach only the named symbol's subscribers."""
+    mgr = BinanceOrderbookManager()
+    received = []
+
+    async def cb(data):
+        received.append(data)
+
+    mgr.subscribers["ethusdt"] = {cb}
+    mgr.subscribers["btcusdt"] = {_noop_callback}
+    data = {"bids": [["3000", "1"]], "asks": [["3001", "1"]], "lastUpdateId": 1}
+    await mgr._process_orderbook_update(_combined("ethusdt", data))
+    await mgr._process_orderbook_update(json.dumps({"result": None, "id": 1}))
+    assert [d["symbol"] for d in received] == ["ETHUSDT"]
+    assert "btcusdt" not in mgr.orderbooks
+
+
+@pytest.mark.asyncio
+async def test_binance_manager_multiplexes_symbols():
+    """New symbols are added to the shared connection; the last unsubscribe closes it."""
+    mgr = BinanceOrderbookManager()
+    stream = asyncio.get_running_loop().create_future()
+    ws = FakeWebSocket()
+    mgr._stream_task = stream
+    mgr._websocket = ws
+
+    async def cb_a(data):
+        pass
+
+    async def cb_b(data):
+        pass
+
+    await mgr.subscribe_to_symbol("BTCUSDT", cb_a)
+    await mgr.subscribe_to_symbol("BTCUSDT", cb_a)
+    await mgr.subscribe_to_symbol("BTCUSDT", cb_b)
+    await mgr.subscribe_to_symbol("ETHUSDT", cb_a)
+    assert mgr.subscribers["btcusdt"] == {cb_a, cb_b}
+    assert [(m["method"], m["params"]) for m in ws.sent] == [
+        ("SUBSCRIBE", ["btcusdt@depth20@100ms"]),
+        ("SUBSCRIBE", ["ethusdt@depth20@100ms"]),
+    ]
+    assert ws.sent[0]["id"] != ws.sent[1]["id"]
+
+    await mgr.unsubscribe_from_symbol("BTCUSDT", cb_a)
+    await mgr.unsubscribe_from_symbol("BTCUSDT", cb_b)
+    assert "btcusdt" not in mgr.subscribers
+    assert ws.sent[-1]["method"] == "UNSUBSCRIBE"
+    assert ws.sent[-1]["params"] == ["btcusdt@depth20@100ms"]
+    assert not stream.cancelled()
+
+    await mgr.unsubscribe_from_symbol("ETHUSDT", cb_a)
+    assert stream.cancelled()
+    assert mgr._stream_task is None
+    assert len(ws.sent) == 3
+
+
+@pytest.mark.asyncio
+async def test_binance_manager_reuses_http_session():
+    """REST calls should share one session until the manager is closed."""
+    mgr = BinanceOrderbookManager()
+    session = await mgr._get_session()
+    assert await mgr._get_session() is session
+
+    await mgr.close()
+    assert session.closed
+    assert await mgr._get_session() is not session
+    await mgr.close()
+
+
+@pytest.mark.asyncio
+async def test_binance_manager_caches_symbols():
+    """Symbols should be fetched once per TTL and refetched after invalidation."""
+    mgr = BinanceOrderbookManager()
+    calls = []
+
+    async def fake_fetch():
+        calls.append(1)
+        return [f"SYM{i}" for i in range(60)]
+
+    mgr._fetch_symbols = fake_fetch
+    assert len(await mgr.get_available_symbols()) == 50
+    await mgr.get_available_symbols()
+    assert len(calls) == 1
+
+    mgr.invalidate_symbols()
+    await mgr.get_available_symbols()
+    assert len(calls) == 2
+
+    mgr._symbols_ttl = 0
+    await mgr.get_available_symbols()
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_binance_manager_symbols_fallback_not_cached():
+    """A failed fetch should return the fallback list without caching it."""
+    mgr = BinanceOrderbookManager()
+
+    async def failing_fetch():
+        raise RuntimeError("network down")
+
+    mgr._fetch_symbols = failing_fetch
+    assert await mgr.get_available_symbols() == ['BTCUSDT', 'ETHUSDT', 'ADAUSDT']
+    assert mgr._symbols_cache is None
+
+
+# ---------------------------------------------------------------------------
+# MarketDataServicer Tests
+# ---------------------------------------------------------------------------
+
+def _make_servicer():
+    servicer = MarketDataServicer(FakeConfig())
+    servicer.orderbooks[1].binance_manager = FakeBinanceManager()
+    return servicer
+
+
+@pytest.mark.asyncio
+async def test_fanout_publishes_latest_frame():
+    """Each tick should replace the latest serialized frame and bump its sequence."""
+    servicer = _make_servicer()
+    servicer._active_streams[1].add(FakeContext())
+
+    await servicer._queue_update_for_streams(1, _make_raw(n_levels=3))
+    await servicer._queue_update_for_streams(1, dict(_make_raw(n_levels=2), last_update_id=12346))
+
+    seq, frame = servicer._latest[1]
+    assert seq == 2
+    update = market_data_pb2.OrderbookUpdate.FromString(frame)
+    assert update.snapshot.instrument_id == 1
+    assert len(update.snapshot.bids) == 2
+
+
+@pytest.mark.asyncio
+async def test_fanout_skipped_without_streams():
+    """No frame should be built when nobody is subscribed."""
+    servicer = _make_servicer()
+    await servicer._queue_update_for_streams(1, _make_raw())
+    assert 1 not in servicer._latest
+
+
+@pytest.mark.asyncio
+async def test_subscribe_streams_latest_frames():
+    """A stream should get the initial snapshot, then each published frame."""
+    servicer = _make_servicer()
+    await servicer.orderbooks[1]._handle_binance_update(_make_raw(n_levels=5))
+
+    stream = servicer.SubscribeOrderbook(FakeRequest(1), FakeContext())
+    initial = market_data_pb2.OrderbookUpdate.FromString(await stream.__anext__())
+    assert len(initial.snapshot.bids) == 5
+
+    await servicer._queue_update_for_streams(1, _make_raw(n_levels=2))
+    assert await stream.__anext__() is servicer._latest[1][1]
+    await stream.aclose()
+    assert not servicer._active_streams[1]
+
+
+@pytest.mark.asyncio
+async def test_stream_ends_when_rpc_done():
+    """A stream waiting for data should stop as soon as its RPC finishes."""
+    servicer = _make_servicer()
+    await servicer.orderbooks[1]._handle_binance_update(_make_raw())
+
+    context = FakeContext()
+    stream = servicer.SubscribeOrderbook(FakeRequest(1), context)
+    await stream.__anext__()
+
+    pending = asyncio.ensure_future(stream.__anext__())
+    await asyncio.sleep(0)
+    assert not pending.done()
+
+    context.finish()
+    with pytest.raises(StopAsyncIteration):
+        await asyncio.wait_for(pending, timeout=0.5)
+    assert not servicer._active_streams[1]
+
+
+@pytest.mark.asyncio
+async def test_slow_consumer_evicted():
+    """A stream lagging more than the limit should be closed with RESOURCE_EXHAUSTED."""
+    servicer = _make_servicer()
+    await servicer.orderbooks[1]._handle_binance_update(_make_raw())
+
+    context = FakeContext()
+    stream = servicer.SubscribeOrderbook(FakeRequest(1), context)
+    await stream.__anext__()
+
+    for i in range(SLOW_CONSUMER_MAX_MISSED + 2):
+        await servicer._queue_update_for_streams(1, dict(_make_raw(), last_update_id=i + 1))
+
+    with pytest.raises(StopAsyncIteration):
+        await stream.__anext__()
+    assert context.code == grpc.StatusCode.RESOURCE_EXHAUSTED
+    assert not servicer._active_streams[1]
+
+
+def test_serialize_update_passthrough():
+    """Pre-serialized frames pass through, messages get serialized."""
+    update = market_data_pb2.OrderbookUpdate(
+        snapshot=market_data_pb2.OrderbookSnapshot(instrument_id=7)
+    )
+    frame = update.SerializeToString()
+    assert _serialize_update(frame) is frame
+    assert _serialize_update(update) == frame
+
+
 # ---------------------------------------------------------------------------
 # Metrics Tests
 # ---------------------------------------------------------------------------